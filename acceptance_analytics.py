@@ -0,0 +1,291 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from tenant_backend import TENANT_NAME
+
+BUCKET_SECONDS = 86400  # one counter bucket per UTC day
+
+# Sends are forgotten after this long. Links advertise a 7 day expiry but
+# it isn't enforced, so late acceptances still get matched to their send
+PENDING_TTL_SECONDS = 30 * 86400
+
+DEFAULT_TENANT = "default"
+
+DEFAULT_DATA_DIR = "acceptance_analytics"
+
+# Sketch bin used for zero-length time-to-accept values
+ZERO_BIN = -(2 ** 62)
+
+# One database per tenant, so these tables never need a tenant column
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS quotes (
+    doc_id TEXT PRIMARY KEY,
+    sent_at REAL NOT NULL,
+    accepted_at REAL
+);
+CREATE INDEX IF NOT EXISTS quotes_sent_at ON quotes(sent_at);
+CREATE TABLE IF NOT EXISTS counters (
+    bucket INTEGER PRIMARY KEY,
+    sent INTEGER NOT NULL DEFAULT 0,
+    accepted INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS sketch_bins (
+    bucket INTEGER NOT NULL,
+    bin INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (bucket, bin)
+);
+"""
+
+
+class QuantileSketch:
+    """Streaming quantile sketch with bounded relative error (DDSketch).
+
+    Values land in logarithmic buckets, so inserts are O(1), sketches for
+    different time buckets merge by adding counts, and any reported
+    quantile is within relative_accuracy of the true value.
+    """
+
+    def __init__(self, relative_accuracy=0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.bins = defaultdict(int)
+        self.zero_count = 0
+        self.count = 0
+
+    def index(self, value):
+        """Bin index for value, None for values that count as zero"""
+
+        if value <= 0:
+            return None
+        return math.ceil(math.log(value) / self.log_gamma)
+
+    def add(self, value):
+        self.add_count(self.index(value), 1)
+
+    def add_count(self, index, n):
+        if index is None:
+            self.zero_count += n
+        else:
+            self.bins[index] += n
+        self.count += n
+
+    def merge(self, other):
+        for index, n in other.bins.items():
+            self.bins[index] += n
+        self.zero_count += other.zero_count
+        self.count += other.count
+
+    def quantile(self, q):
+        """Approximate q-quantile (0 <= q <= 1), None when empty"""
+
+        if self.count == 0:
+            return None
+
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if rank < seen:
+                return 2 * self.gamma ** index / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.bins) / (self.gamma + 1)
+
+
+class AcceptanceAnalytics:
+    """Pre-aggregated send/accept counters and time-to-accept per tenant.
+
+    Every quote is attributed to the day it was sent, so a window query
+    answers "of the quotes sent in this window, how many were accepted and
+    how fast". Recording is O(1); queries touch one bucket per day in the
+    window, never individual quotes.
+
+    State lives in one SQLite file per tenant under data_dir, shared by
+    every process that sends or accepts quotes (generator, campaign CLI,
+    acceptance and webhook servers), so a send recorded in one process is
+    matched by an acceptance recorded in another and survives restarts.
+    A campaign writing for one business only takes that business's write
+    lock; other tenants' sends, accepts and queries never wait on it.
+    """
+
+    def __init__(self, data_dir=None, bucket_seconds=BUCKET_SECONDS, relative_accuracy=0.01):
+        self.data_dir = data_dir or os.environ.get('ACCEPTANCE_ANALYTICS_DIR', DEFAULT_DATA_DIR)
+        self.bucket_seconds = bucket_seconds
+        self.relative_accuracy = relative_accuracy
+        self.local = threading.local()
+
+    def record_sent(self, doc_id, tenant=DEFAULT_TENANT, sent_at=None):
+        """Count a quote as sent; repeated calls for the same doc_id are ignored"""
+
+        sent_at = time.time() if sent_at is None else sent_at
+
+        with self._transaction(tenant) as conn:
+            inserted = conn.execute(
+                "INSERT OR IGNORE INTO quotes (doc_id, sent_at) VALUES (?, ?)",
+                (doc_id, sent_at)
+            ).rowcount
+            if not inserted:
+                return False
+            conn.execute(
+                "INSERT INTO counters (bucket, sent) VALUES (?, 1) "
+                "ON CONFLICT (bucket) DO UPDATE SET sent = sent + 1",
+                (self._bucket(sent_at),)
+            )
+            # Indexed on sent_at, so this only ever touches expired rows
+            conn.execute("DELETE FROM quotes WHERE sent_at < ?",
+                         (sent_at - PENDING_TTL_SECONDS,))
+        return True
+
+    def record_accepted(self, doc_id, tenant=DEFAULT_TENANT, accepted_at=None):
+        """Count an acceptance against the quote's send bucket.
+
+        Returns False for unknown or already-accepted documents.
+        """
+
+        accepted_at = time.time() if accepted_at is None else accepted_at
+
+        with self._transaction(tenant) as conn:
+            updated = conn.execute(
+                "UPDATE quotes SET accepted_at = ? WHERE doc_id = ? AND accepted_at IS NULL",
+                (accepted_at, doc_id)
+            ).rowcount
+            if not updated:
+                return False
+            sent_at, = conn.execute(
+                "SELECT sent_at FROM quotes WHERE doc_id = ?", (doc_id,)
+            ).fetchone()
+
+            bucket = self._bucket(sent_at)
+            conn.execute(
+                "INSERT INTO counters (bucket, accepted) VALUES (?, 1) "
+                "ON CONFLICT (bucket) DO UPDATE SET accepted = accepted + 1",
+                (bucket,)
+            )
+            index = QuantileSketch(self.relative_accuracy).index(max(0.0, accepted_at - sent_at))
+            conn.execute(
+                "INSERT INTO sketch_bins (bucket, bin, count) VALUES (?, ?, 1) "
+                "ON CONFLICT (bucket, bin) DO UPDATE SET count = count + 1",
+                (bucket, ZERO_BIN if index is None else index)
+            )
+        return True
+
+    def summary(self, tenant=DEFAULT_TENANT, since=None, until=None,
+                quantiles=(0.5, 0.9, 0.99)):
+        """Acceptance rate and time-to-accept for quotes sent in [since, until)"""
+
+        until = time.time() if until is None else until
+        since = until - 7 * 86400 if since is None else since
+        first, last = self._bucket(since), self._bucket(until - 1)
+
+        sent = accepted = 0
+        merged = QuantileSketch(self.relative_accuracy)
+
+        # A tenant that never sent anything has no database yet
+        conn = self._connection(tenant, create=False)
+        if conn is not None:
+            sent, accepted = conn.execute(
+                "SELECT COALESCE(SUM(sent), 0), COALESCE(SUM(accepted), 0) FROM counters "
+                "WHERE bucket BETWEEN ? AND ?",
+                (first, last)
+            ).fetchone()
+
+            for index, count in conn.execute(
+                    "SELECT bin, SUM(count) FROM sketch_bins "
+                    "WHERE bucket BETWEEN ? AND ? GROUP BY bin",
+                    (first, last)):
+                merged.add_count(None if index == ZERO_BIN else index, count)
+
+        return {
+            'tenant': tenant,
+            'since': first * self.bucket_seconds,
+            'until': (last + 1) * self.bucket_seconds,
+            'sent': sent,
+            'accepted': accepted,
+            'acceptance_rate': accepted / sent if sent else None,
+            'time_to_accept_seconds': {
+                f"p{round(q * 100):g}": merged.quantile(q) for q in quantiles
+            },
+        }
+
+    def _bucket(self, timestamp):
+        return int(timestamp // self.bucket_seconds)
+
+    def db_path(self, tenant):
+        """SQLite file holding tenant's analytics, ValueError for bad names"""
+
+        if not TENANT_NAME.match(tenant or ''):
+            raise ValueError(f"Tenant name must match {TENANT_NAME.pattern}")
+        return os.path.join(self.data_dir, f"{tenant}.sqlite3")
+
+    def _connection(self, tenant, create=True):
+        # One connection per thread and tenant; opened lazily so importing
+        # is side-effect free
+        conns = getattr(self.local, 'conns', None)
+        if conns is None:
+            conns = self.local.conns = {}
+
+        conn = conns.get(tenant)
+        if conn is None:
+            path = self.db_path(tenant)
+            if not create and not os.path.exists(path):
+                return None
+            os.makedirs(self.data_dir, exist_ok=True)
+            conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            conns[tenant] = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self, tenant):
+        conn = self._connection(tenant)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+
+# Shared instance updated by the send and accept paths
+analytics = AcceptanceAnalytics()
+
+
+def register_analytics_routes(app, analytics=analytics, tenants=None):
+    """Add GET /api/analytics to a Flask app.
+
+    With a TenantRegistry the tenant must be given as a signed token
+    (TenantRegistry.sign), so one business can't read another's numbers.
+    """
+
+    from flask import request, jsonify
+
+    @app.route('/api/analytics')
+    def acceptance_summary():
+        # ?tenant=<name, or signed token with a registry>&since=<unix ts>&until=<unix ts>
+        if tenants is not None:
+            partition = tenants.from_token(request.args.get('tenant'))
+            if partition is None:
+                return "Invalid tenant token", 403
+            tenant = partition.name
+        else:
+            tenant = request.args.get('tenant', DEFAULT_TENANT)
+
+        try:
+            summary = analytics.summary(
+                tenant=tenant,
+                since=request.args.get('since', type=float),
+                until=request.args.get('until', type=float)
+            )
+        except ValueError as e:
+            return str(e), 400
+        return jsonify(summary), 200
+
+    return app
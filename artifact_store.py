@@ -0,0 +1,360 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+# Chunks are only stored gzipped when it saves at least this fraction
+MIN_COMPRESSION_SAVING = 0.10
+
+READ_SIZE = 1024 * 1024
+
+# Content-defined chunking bounds (FastCDC-style gear hash). Boundaries
+# depend only on nearby bytes, so a uuid or timestamp that differs between
+# two agreements only changes the chunks around it.
+MIN_CHUNK = 2 * 1024
+AVG_CHUNK_BITS = 13  # ~8 KiB average
+MAX_CHUNK = 64 * 1024
+CHUNK_MASK = ((1 << AVG_CHUNK_BITS) - 1) << (32 - AVG_CHUNK_BITS)
+
+# Fixed pseudo-random table; must never change or existing chunks stop matching
+GEAR = [int.from_bytes(hashlib.sha256(bytes([i])).digest()[:4], 'big') for i in range(256)]
+
+# Files at least this big are chunked in a worker process; the gear hash is
+# a pure-Python loop and would otherwise hold the GIL for the whole file
+POOL_CHUNK_BYTES = 256 * 1024
+
+# Materialized files kept for sendfile/Range serving
+DEFAULT_CACHE_BYTES = 512 * 1024 * 1024
+
+# Cached files used this recently are never evicted, so a path handed to
+# send_file can't disappear before it is opened
+CACHE_GRACE_SECONDS = 300
+
+_chunk_pool = None
+_chunk_pool_lock = threading.Lock()
+
+
+def iter_chunks(f):
+    """Split a binary stream into content-defined chunks"""
+
+    buf = b''
+    pos = 0
+    eof = False
+    while True:
+        if not eof and len(buf) - pos < MAX_CHUNK:
+            data = f.read(READ_SIZE)
+            eof = not data
+            buf = buf[pos:] + data
+            pos = 0
+            continue
+        if pos >= len(buf):
+            return
+
+        cut = _find_cut(buf, pos, min(len(buf), pos + MAX_CHUNK))
+        yield buf[pos:cut]
+        pos = cut
+
+
+def _find_cut(buf, pos, end, gear=GEAR, mask=CHUNK_MASK):
+    h = 0
+    i = pos + MIN_CHUNK
+    for byte in buf[i:end]:
+        h = ((h << 1) + gear[byte]) & 0xFFFFFFFF
+        i += 1
+        if not h & mask:
+            return i
+    return end
+
+
+def content_id(record):
+    """Identifier of an artifact's bytes, used as cache key and ETag"""
+
+    # Appended artifacts have no whole-file hash, see ArtifactStore.append
+    return record.get('content_id') or record['sha256']
+
+
+def chunk_lengths(path):
+    """Lengths of the content-defined chunks of the file at path"""
+
+    with open(path, 'rb') as f:
+        return [len(chunk) for chunk in iter_chunks(f)]
+
+
+def _pool():
+    global _chunk_pool
+    with _chunk_pool_lock:
+        if _chunk_pool is None:
+            # spawn: forking a process that runs store worker threads is unsafe
+            _chunk_pool = ProcessPoolExecutor(mp_context=multiprocessing.get_context('spawn'))
+        return _chunk_pool
+
+
+class ArtifactStore:
+    """Content-addressed, deduplicated store for generated agreements.
+
+    Layout under root:
+        chunks/ab/abcdef...[.gz]  content-defined chunk, named by its SHA-256
+        refs/<name>.json          artifact name -> whole-file hash and chunk list
+        cache/<content id>        reassembled file, served with sendfile
+
+    Artifacts are split into variable-size chunks and each distinct chunk is
+    stored once, so agreements that share text, embedded images or fonts
+    share those bytes on disk even though the per-document link, QR code and
+    creation date make every file hash differently. Sharing happens at byte
+    level: data that a PDF writer compresses differently in each document
+    (e.g. a page stream mixing shared text with a uuid) is not deduplicated.
+    """
+
+    def __init__(self, root="artifacts", cache_bytes=DEFAULT_CACHE_BYTES):
+        self.root = os.path.abspath(root)
+        self.chunk_dir = os.path.join(self.root, "chunks")
+        self.ref_dir = os.path.join(self.root, "refs")
+        self.cache_dir = os.path.join(self.root, "cache")
+        self.cache_bytes = cache_bytes
+        for path in (self.chunk_dir, self.ref_dir, self.cache_dir):
+            os.makedirs(path, exist_ok=True)
+
+    def put_file(self, name, path, content_type="application/pdf"):
+        """Store the file at path under name, returns the artifact record"""
+
+        if os.path.getsize(path) >= POOL_CHUNK_BYTES:
+            # Boundaries come back from a worker process; hashing and
+            # writing below release the GIL for the big reads
+            lengths = _pool().submit(chunk_lengths, path).result()
+        else:
+            lengths = None
+
+        digest = hashlib.sha256()
+        chunks = []
+        with open(path, 'rb') as f:
+            pieces = iter_chunks(f) if lengths is None else (f.read(n) for n in lengths)
+            for chunk in pieces:
+                digest.update(chunk)
+                chunks.append(self._store_chunk(chunk))
+
+        record = {
+            'name': name,
+            'sha256': digest.hexdigest(),
+            'size': sum(size for _, size in chunks),
+            'content_type': content_type,
+            'chunks': chunks,
+        }
+        self._write_ref(name, record)
+        return record
+
+    def append(self, base_name, name, data):
+        """Store base_name's content followed by data as a new artifact.
+
+        The base's chunk list is reused as is and only data is chunked, so
+        the cost follows the size of the appended bytes (e.g. a PDF
+        incremental update), not the size of the artifact.
+        """
+
+        base = self.get(base_name)
+        if base is None:
+            raise KeyError(base_name)
+
+        chunks = list(base['chunks'])
+        for chunk in iter_chunks(BytesIO(data)):
+            chunks.append(self._store_chunk(chunk))
+
+        # A whole-file hash would mean reading the base back; the base's id
+        # plus the appended bytes identify the content just as well
+        appended = hashlib.sha256(data).hexdigest()
+        record = {
+            'name': name,
+            'content_id': hashlib.sha256(f"{content_id(base)}+{appended}".encode()).hexdigest(),
+            'base': base_name,
+            'size': base['size'] + len(data),
+            'content_type': base['content_type'],
+            'chunks': chunks,
+        }
+        self._write_ref(name, record)
+        return record
+
+    def put_bytes(self, name, data, content_type="application/pdf"):
+        """Store in-memory content under name"""
+
+        with tempfile.NamedTemporaryFile(dir=self.root, delete=False) as tmp:
+            tmp.write(data)
+        try:
+            return self.put_file(name, tmp.name, content_type)
+        finally:
+            os.unlink(tmp.name)
+
+    def get(self, name):
+        """Artifact record for name, or None"""
+
+        try:
+            with open(self._ref_path(name)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def find_chunk(self, sha):
+        """Path of the stored chunk for sha, or None if not stored"""
+
+        raw = self._chunk_path(sha)
+        if os.path.exists(raw):
+            return raw
+        if os.path.exists(raw + '.gz'):
+            return raw + '.gz'
+        return None
+
+    def open(self, name):
+        """Open the artifact's content for reading"""
+
+        return open(self.materialize(name), 'rb')
+
+    def materialize(self, name):
+        """Path of a plain copy of the artifact, reassembled on first use.
+
+        Copies live in cache/ keyed by content id, so they can be handed
+        to sendfile or mmapped; the least recently used are evicted once the
+        cache grows past cache_bytes. A copy used within the last
+        CACHE_GRACE_SECONDS is never evicted, so the returned path stays
+        valid while the caller opens it.
+        """
+
+        record = self.get(name)
+        if record is None:
+            raise KeyError(name)
+
+        path = os.path.join(self.cache_dir, content_id(record))
+        try:
+            os.utime(path)
+            return path
+        except FileNotFoundError:
+            pass
+
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as out:
+            for sha, _ in record['chunks']:
+                out.write(self._read_chunk(sha))
+        os.replace(tmp, path)
+
+        self._evict_cache(keep=path)
+        return path
+
+    def _read_chunk(self, sha):
+        path = self.find_chunk(sha)
+        if path is None:
+            raise FileNotFoundError(f"Missing chunk {sha}")
+        if path.endswith('.gz'):
+            with gzip.open(path, 'rb') as f:
+                return f.read()
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def _store_chunk(self, chunk):
+        sha = hashlib.sha256(chunk).hexdigest()
+        if self.find_chunk(sha) is None:
+            self._write_chunk(sha, chunk)
+        return [sha, len(chunk)]
+
+    def _write_chunk(self, sha, chunk):
+        raw_path = self._chunk_path(sha)
+        os.makedirs(os.path.dirname(raw_path), exist_ok=True)
+
+        compressed = gzip.compress(chunk, mtime=0)
+        if len(compressed) <= len(chunk) * (1 - MIN_COMPRESSION_SAVING):
+            data, path = compressed, raw_path + '.gz'
+        else:
+            data, path = chunk, raw_path
+
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(raw_path))
+        with os.fdopen(fd, 'wb') as out:
+            out.write(data)
+        os.replace(tmp, path)
+
+    def _evict_cache(self, keep):
+        entries = []
+        total = 0
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith('.tmp'):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+
+        recent = time.time() - CACHE_GRACE_SECONDS
+        for mtime, size, path in sorted(entries):
+            if total <= self.cache_bytes or mtime >= recent:
+                # Sorted oldest first, so everything after is recent too
+                break
+            if path == keep:
+                continue
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def _write_ref(self, name, record):
+        fd, tmp = tempfile.mkstemp(dir=self.ref_dir)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(record, f)
+        os.replace(tmp, self._ref_path(name))
+
+    def _chunk_path(self, sha):
+        return os.path.join(self.chunk_dir, sha[:2], sha)
+
+    def _ref_path(self, name):
+        if not name or '/' in name or '\\' in name or name.startswith('.'):
+            raise ValueError(f"Invalid artifact name: {name!r}")
+        return os.path.join(self.ref_dir, name + '.json')
+
+
+def create_artifact_server(store):
+    """Flask app serving stored artifacts with Range and conditional GET"""
+
+    from flask import Flask, send_file, abort
+
+    app = Flask(__name__)
+
+    @app.route('/artifacts/<name>')
+    def serve_artifact(name):
+        try:
+            record = store.get(name)
+        except ValueError:
+            abort(404)
+        if record is None:
+            abort(404)
+
+        try:
+            path = store.materialize(name)
+        except FileNotFoundError:
+            abort(404)
+
+        extension = mimetypes.guess_extension(record['content_type']) or ''
+
+        # Plain cached copy: the WSGI file_wrapper hands it to sendfile and
+        # Range requests only read the requested bytes
+        response = send_file(path, mimetype=record['content_type'],
+                             conditional=True, etag=content_id(record), max_age=31536000,
+                             download_name=name + extension)
+        response.headers['Accept-Ranges'] = 'bytes'
+        return response
+
+    return app
+
+
+if __name__ == '__main__':
+    # Store the agreement produced by frictionless_pdf_accept.py
+    store = ArtifactStore("artifacts")
+    record = store.put_file("agreement", "agreement.pdf")
+    print(f"Stored agreement as {record['sha256'][:12]} "
+          f"({record['size']} bytes in {len(record['chunks'])} chunks)")
+
+    app = create_artifact_server(store)
+    # app.run(host='0.0.0.0', port=5000)
@@ -1,15 +1,26 @@
 import requests
+from acceptance_analytics import DEFAULT_TENANT, analytics, register_analytics_routes
 from docusign_esign import ApiClient, EnvelopesApi, Document, Signer, Recipients, EnvelopeDefinition
 
 class DocumentAcceptanceSystem:
-    def __init__(self, api_key, account_id):
+    def __init__(self, api_key, account_id, tenants=None):
         self.api_key = api_key
         self.account_id = account_id
         self.api_client = ApiClient()
+        # Optional TenantRegistry; webhooks then name their tenant with a signed token
+        self.tenants = tenants
 
-    def create_document_with_accept_button(self, pdf_path, recipient_email):
+    def create_document_with_accept_button(self, pdf_path, recipient_email, tenant=DEFAULT_TENANT):
         """Create a document with acceptance tracking"""
 
+        webhook_url = "https://your-server.com/webhook/docusign"
+        if tenant != DEFAULT_TENANT:
+            if self.tenants is None:
+                raise ValueError(f"Tenant {tenant!r} given but no TenantRegistry is configured")
+            self.tenants.require(tenant)
+            # The acceptance is counted in the same tenant's analytics
+            webhook_url += f"?tenant={self.tenants.sign(tenant)}"
+
         # Create envelope with document
         envelope_definition = EnvelopeDefinition(
             email_subject="Please review and accept",
@@ -39,7 +50,7 @@ class DocumentAcceptanceSystem:
             status="sent",
             # Webhook for real-time notifications
             event_notification={
-                "url": "https://your-server.com/webhook/docusign",
+                "url": webhook_url,
                 "events": ["recipient-completed", "envelope-completed"]
             }
         )
@@ -48,6 +59,8 @@ class DocumentAcceptanceSystem:
         envelopes_api = EnvelopesApi(self.api_client)
         results = envelopes_api.create_envelope(self.account_id, envelope_definition=envelope_definition)
 
+        analytics.record_sent(results.envelope_id, tenant=tenant)
+
         return results.envelope_id
 
     def setup_webhook_listener(self):
@@ -60,14 +73,24 @@ class DocumentAcceptanceSystem:
         def handle_docusign_webhook():
             data = request.json
 
+            tenant = DEFAULT_TENANT
+            if 'tenant' in request.args:
+                partition = self.tenants.from_token(request.args['tenant']) if self.tenants else None
+                if partition is None:
+                    return jsonify({"error": "invalid tenant token"}), 403
+                tenant = partition.name
+
             if data.get('event') == 'recipient-completed':
                 # Client accepted the document
+                analytics.record_accepted(data['envelope_id'], tenant=tenant)
                 self.send_notification(
                     f"Client {data['recipient_email']} accepted document {data['envelope_id']}"
                 )
 
             return jsonify({"status": "received"}), 200
 
+        register_analytics_routes(app, tenants=self.tenants)
+
         return app
 
     def send_notification(self, message):
@@ -92,6 +115,7 @@ class DocumentAcceptanceSystem:
         # Update your database to record the acceptance
 
 # Usage
-system = DocumentAcceptanceSystem(api_key="your-key", account_id="your-account")
-envelope_id = system.create_document_with_accept_button("contract.pdf", "client@email.com")
-print(f"Document sent with tracking ID: {envelope_id}")
\ No newline at end of file
+if __name__ == '__main__':
+    system = DocumentAcceptanceSystem(api_key="your-key", account_id="your-account")
+    envelope_id = system.create_document_with_accept_button("contract.pdf", "client@email.com")
+    print(f"Document sent with tracking ID: {envelope_id}")
\ No newline at end of file
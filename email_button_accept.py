@@ -1,5 +1,18 @@
-def send_email_with_accept_button(client_email, doc_id):
-    """Send email with a single accept button - simplest possible approach"""
+from acceptance_analytics import DEFAULT_TENANT, analytics
+
+def send_email_with_accept_button(client_email, doc_id, pdf_path='agreement.pdf',
+                                  accept_url=None, short_id=None, tenant=DEFAULT_TENANT):
+    """Send email with a single accept button - simplest possible approach
+
+    accept_url, short_id and tenant come from create_pdf_with_one_click_accept
+    so the button opens the same link as the PDF and the quote is counted
+    once, under the key its acceptance will be recorded with.
+    """
+
+    if accept_url is None:
+        accept_url = f"https://your-domain.com/accept?id={doc_id}"
+    if short_id is None:
+        short_id = doc_id[:8]
 
     html_content = f'''
     <html>
@@ -9,7 +22,7 @@ def send_email_with_accept_button(client_email, doc_id):
         <p>When ready, click the button below to accept:</p>
 
         <div style="text-align: center; margin: 40px 0;">
-            <a href="https://your-domain.com/accept?id={doc_id}"
+            <a href="{accept_url}"
                style="background-color: #10b981;
                       color: white;
                       padding: 15px 50px;
@@ -23,7 +36,7 @@ def send_email_with_accept_button(client_email, doc_id):
         </div>
 
         <p style="color: #666; font-size: 12px;">
-            This link expires in 7 days. Document ID: {doc_id[:8]}
+            This link expires in 7 days. Document ID: {short_id}
         </p>
     </body>
     </html>
@@ -44,7 +57,7 @@ def send_email_with_accept_button(client_email, doc_id):
     msg.attach(MIMEText(html_content, 'html'))
 
     # Attach PDF
-    with open('agreement.pdf', 'rb') as f:
+    with open(pdf_path, 'rb') as f:
         pdf_attachment = MIMEApplication(f.read(), _subtype='pdf')
         pdf_attachment.add_header('Content-Disposition', 'attachment', filename='agreement.pdf')
         msg.attach(pdf_attachment)
@@ -55,4 +68,8 @@ def send_email_with_accept_button(client_email, doc_id):
         server.login('your-email@gmail.com', 'your-app-password')
         server.send_message(msg)
 
+    # Counted only once the email is out, under the same key and tenant the
+    # PDF path records, so a quote already counted at render isn't counted twice
+    analytics.record_sent(short_id, tenant=tenant)
+
     print(f"Email sent with one-click acceptance to {client_email}")
\ No newline at end of file
@@ -1,27 +1,58 @@
+import logging
+import os
+import threading
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.colors import HexColor
+from reportlab.lib.utils import ImageReader
 import qrcode
 from io import BytesIO
 import base64
+from acceptance_analytics import DEFAULT_TENANT, analytics, register_analytics_routes
+from pdf_stamp import AcceptanceStamper
+from tenant_backend import TenantPartition
 
 class FrictionlessPDFAcceptance:
-    def __init__(self, base_url="https://your-domain.com"):
+    def __init__(self, base_url="https://your-domain.com", tenants=None, artifacts=None,
+                 documents_db="documents.sqlite3"):
         self.base_url = base_url
+        # Optional TenantRegistry for multi-business deployments
+        self.tenants = tenants
+        # Optional ArtifactStore holding the rendered agreements
+        self.artifacts = artifacts
+        # Documents created without a tenant; opened on first use
+        self.documents_db = documents_db
+        self.default_documents = None
+        # Stamping runs off the request thread; one worker also keeps two
+        # stamps from ever appending to the same file at once
+        self.stamp_executor = None
+        self.lock = threading.Lock()
 
     def create_pdf_with_one_click_accept(self,
                                         content,
                                         client_name,
-                                        output_path="agreement.pdf"):
-        """Create PDF with the simplest possible acceptance process"""
+                                        output_path="agreement.pdf",
+                                        tenant=None,
+                                        client_email=None,
+                                        track_send=True):
+        """Create PDF with the simplest possible acceptance process
+
+        track_send=False leaves counting the send to the delivery channel
+        (e.g. DocuSign, which tracks acceptance by envelope id).
+        """
+
+        # Fail before writing anything if the tenant can't be resolved
+        partition = self.tenant_partition(tenant)
 
         # Generate unique, secure acceptance link
         doc_id = str(uuid.uuid4())
 
-        # Create short, memorable link
-        accept_url = f"{self.base_url}/a/{doc_id[:8]}"
+        # Create short, memorable link (prefixed with the business when multi-tenant)
+        short_id = self.short_id_for(doc_id, tenant)
+        accept_url = f"{self.base_url}/a/{short_id}"
 
         # Create PDF
         c = canvas.Canvas(output_path, pagesize=letter)
@@ -85,18 +116,90 @@ class FrictionlessPDFAcceptance:
         img_buffer.seek(0)
 
         # Add QR to PDF
-        c.drawInlineImage(img_buffer, 450, y-85, width=80, height=80)
+        c.drawImage(ImageReader(img_buffer), 450, y-85, width=80, height=80)
 
         # Footer with expiry info
         c.setFont("Helvetica", 9)
         c.setFillColor(HexColor("#6b7280"))
         c.drawCentredString(width/2, 50,
-                          f"This acceptance link expires in 7 days. Document ID: {doc_id[:8]}")
+                          f"This acceptance link expires in 7 days. Document ID: {short_id}")
 
         c.save()
 
+        partition.save_document(short_id, doc_id, client_name, client_email,
+                                pdf_path=os.path.abspath(output_path))
+
+        # Short id is what the acceptance page posts back
+        if track_send:
+            analytics.record_sent(short_id, tenant=tenant or DEFAULT_TENANT)
+
         return doc_id, accept_url
 
+    def stamp_acceptance(self, document, acceptance_record):
+        """Add the certificate of acceptance to a document's PDF in the background.
+
+        Returns a Future for the stamp; the acceptance itself never waits
+        for it, and failures are logged rather than raised.
+        """
+
+        with self.lock:
+            if self.stamp_executor is None:
+                self.stamp_executor = ThreadPoolExecutor(max_workers=1,
+                                                         thread_name_prefix='stamp')
+        return self.stamp_executor.submit(self._stamp, document, acceptance_record)
+
+    def _stamp(self, document, acceptance_record):
+        # With an ArtifactStore only the incremental update is stored, as a
+        # new artifact "<doc_id>-accepted" that reuses the original's chunks
+        # (so the original's content address stays valid); otherwise the
+        # rendered file is stamped in place
+        try:
+            if self.artifacts is not None and self.artifacts.get(document['doc_id']) is not None:
+                with self.artifacts.open(document['doc_id']) as src:
+                    update = AcceptanceStamper().update_for(src, acceptance_record)
+                return self.artifacts.append(document['doc_id'],
+                                             f"{document['doc_id']}-accepted", update)
+
+            if document.get('pdf_path') and os.path.exists(document['pdf_path']):
+                AcceptanceStamper().stamp(document['pdf_path'], acceptance_record)
+            else:
+                logging.warning(f"No PDF to stamp for document {document['short_id']}")
+        except Exception:
+            logging.exception(f"Failed to stamp acceptance for {document['short_id']}")
+
+    def tenant_partition(self, tenant):
+        """Partition recording documents for tenant, ValueError if unusable.
+
+        Documents without a tenant go to a default partition in documents_db.
+        """
+
+        if tenant is None:
+            return self.default_partition()
+        if self.tenants is None:
+            raise ValueError(f"Tenant {tenant!r} given but no TenantRegistry is configured")
+        return self.tenants.require(tenant)
+
+    def default_partition(self):
+        with self.lock:
+            if self.default_documents is None:
+                self.default_documents = TenantPartition(DEFAULT_TENANT, DEFAULT_TENANT,
+                                                         self.documents_db)
+            return self.default_documents
+
+    def document_partition(self, short_id):
+        """Partition that would hold short_id's document"""
+
+        partition = self.tenants.for_short_id(short_id) if self.tenants is not None else None
+        # Unprefixed short ids belong to documents created without a tenant
+        return partition or self.default_partition()
+
+    def short_id_for(self, doc_id, tenant=None):
+        """Short id used in the acceptance link and analytics"""
+
+        if tenant is not None:
+            return self.tenants.short_id(tenant, doc_id)
+        return doc_id[:8]
+
     def create_simple_acceptance_page(self):
         """Create the simplest possible acceptance web page"""
 
@@ -257,13 +360,21 @@ class FrictionlessPDFAcceptance:
 
         @app.route('/a/<doc_id>')
         def accept_page(doc_id):
-            # Verify doc_id exists and isn't expired
-            # Get client info from database
+            # Verify doc_id exists and isn't expired; the short id prefix
+            # selects the business's own database
+            document = self.document_partition(doc_id).get_document(doc_id)
+            if document is not None:
+                client_name = document['client_name']
+            elif self.tenants is not None:
+                return "Unknown or expired link", 404
+            else:
+                # Single-tenant links issued before documents were recorded
+                client_name = "John Smith"
 
             return render_template_string(
                 self.create_simple_acceptance_page(),
                 doc_id=doc_id,
-                client_name="John Smith"  # From database
+                client_name=client_name
             )
 
         @app.route('/api/accept', methods=['POST'])
@@ -280,13 +391,32 @@ class FrictionlessPDFAcceptance:
             }
 
             # Save to database
-            # save_to_database(acceptance_record)
-
-            # Send instant notifications
-            self.send_instant_notification(acceptance_record)
+            partition = self.document_partition(data['doc_id'])
+            document = partition.get_document(data['doc_id'])
+            if document is None:
+                if self.tenants is not None:
+                    return jsonify({'error': 'unknown document'}), 404
+                # Single-tenant link issued before documents were recorded:
+                # accept it, there is just nothing to store or stamp
+                first = True
+            else:
+                first = partition.record_acceptance(acceptance_record)
+                if first:
+                    # Append certificate of acceptance to the agreement
+                    self.stamp_acceptance(document, acceptance_record)
+
+            # A repeated submit (double click, retry) is acknowledged again
+            # but not recorded, stamped or notified twice
+            if first:
+                analytics.record_accepted(acceptance_record['doc_id'], tenant=partition.name)
+
+                # Send instant notifications
+                self.send_instant_notification(acceptance_record)
 
             return jsonify({'status': 'accepted'}), 200
 
+        register_analytics_routes(app, tenants=self.tenants)
+
         return app
 
     def send_instant_notification(self, acceptance_data):
@@ -316,12 +446,13 @@ class FrictionlessPDFAcceptance:
         )
 
 # Usage
-system = FrictionlessPDFAcceptance(base_url="https://accept.yourcompany.com")
-doc_id, accept_url = system.create_pdf_with_one_click_accept(
-    content="Terms and conditions here...",
-    client_name="John Smith",
-    output_path="agreement.pdf"
-)
-
-print(f"PDF created with acceptance URL: {accept_url}")
-# When client clicks, they see a simple page with one button, click it, done!
\ No newline at end of file
+if __name__ == '__main__':
+    system = FrictionlessPDFAcceptance(base_url="https://accept.yourcompany.com")
+    doc_id, accept_url = system.create_pdf_with_one_click_accept(
+        content="Terms and conditions here...",
+        client_name="John Smith",
+        output_path="agreement.pdf"
+    )
+
+    print(f"PDF created with acceptance URL: {accept_url}")
+    # When client clicks, they see a simple page with one button, click it, done!
\ No newline at end of file
@@ -0,0 +1,240 @@
+import mmap
+import os
+import re
+from datetime import datetime, timezone
+from io import BytesIO
+from PyPDF2 import PdfReader
+from PyPDF2.generic import (ArrayObject, DictionaryObject, IndirectObject,
+                            NameObject, NumberObject, TextStringObject)
+
+# Only the tail of the file is scanned to find the previous xref section
+TAIL_SCAN_BYTES = 2048
+
+RECEIPT_PAGE_SIZE = (612, 792)  # US letter, matches the generated agreements
+
+ACCEPTANCE_INFO_KEYS = ('/AcceptedAt', '/AcceptedFromIP', '/AcceptedUserAgent',
+                        '/AcceptedTimezone', '/AcceptanceDocID')
+
+
+class AcceptanceStamper:
+    """Append a certificate of acceptance to an existing PDF.
+
+    The receipt page and metadata are written as a PDF incremental update
+    (ISO 32000-1, 7.5.6): new objects, a new xref section and a trailer that
+    points back at the previous one are appended to the file. The original
+    bytes are never rewritten, so stamping cost follows the size of the
+    update rather than the size of the agreement.
+    """
+
+    def __init__(self, title="Certificate of Acceptance"):
+        self.title = title
+
+    def stamp(self, pdf_path, acceptance_record):
+        """Append the receipt page for acceptance_record to pdf_path in place.
+
+        acceptance_record is the dict built by process_acceptance
+        (doc_id, timestamp, ip_address, user_agent, timezone).
+        Returns the number of bytes appended.
+        """
+
+        with open(pdf_path, 'rb') as f:
+            update = self.update_for(f, acceptance_record)
+
+        with open(pdf_path, 'ab') as f:
+            f.write(update)
+            f.flush()
+            os.fsync(f.fileno())
+
+        return len(update)
+
+    def update_for(self, pdf_file, acceptance_record):
+        """Incremental update bytes for an open PDF file, which is left unchanged"""
+
+        # Memory-map the source so only the pages we touch are read
+        with mmap.mmap(pdf_file.fileno(), 0, access=mmap.ACCESS_READ) as source:
+            return self.build_update(source, acceptance_record)
+
+    def build_update(self, source, acceptance_record):
+        """Return the bytes of an incremental update for a mapped PDF"""
+
+        file_size = len(source)
+        prev_xref = find_startxref(source)
+
+        reader = PdfReader(source)
+        if reader.is_encrypted:
+            raise ValueError("Cannot stamp an encrypted PDF")
+
+        trailer = reader.trailer
+        root_ref = trailer.raw_get('/Root')
+        catalog = root_ref.get_object()
+        pages_ref = catalog.raw_get('/Pages')
+        pages = pages_ref.get_object()
+
+        next_num = int(trailer['/Size'])
+        font_num, content_num, page_num = next_num, next_num + 1, next_num + 2
+        info_ref = trailer.raw_get('/Info') if '/Info' in trailer else None
+        if info_ref is None:
+            info_num = next_num + 3
+            new_size = next_num + 4
+        else:
+            info_num = info_ref.idnum
+            new_size = next_num + 3
+
+        # Updated page tree root: same entries plus the receipt page
+        kids = ArrayObject(pages.raw_get('/Kids'))
+        kids.append(IndirectObject(page_num, 0, reader))
+        new_pages = DictionaryObject(pages)
+        new_pages[NameObject('/Kids')] = kids
+        new_pages[NameObject('/Count')] = NumberObject(int(pages['/Count']) + 1)
+
+        width, height = RECEIPT_PAGE_SIZE
+        page = DictionaryObject({
+            NameObject('/Type'): NameObject('/Page'),
+            NameObject('/Parent'): pages_ref,
+            NameObject('/MediaBox'): ArrayObject(
+                [NumberObject(0), NumberObject(0), NumberObject(width), NumberObject(height)]),
+            NameObject('/Resources'): DictionaryObject({
+                NameObject('/Font'): DictionaryObject({
+                    NameObject('/F1'): IndirectObject(font_num, 0, reader)
+                })
+            }),
+            NameObject('/Contents'): IndirectObject(content_num, 0, reader),
+        })
+
+        font = DictionaryObject({
+            NameObject('/Type'): NameObject('/Font'),
+            NameObject('/Subtype'): NameObject('/Type1'),
+            NameObject('/BaseFont'): NameObject('/Helvetica'),
+            NameObject('/Encoding'): NameObject('/WinAnsiEncoding'),
+        })
+
+        # Keep the document's own entries but never carry over a previous
+        # acceptance's details into this one
+        info = DictionaryObject()
+        if info_ref is not None:
+            for key, value in info_ref.get_object().items():
+                if key not in ACCEPTANCE_INFO_KEYS:
+                    info[NameObject(key)] = value
+        info.update(self.acceptance_metadata(acceptance_record))
+
+        content = self.receipt_content(acceptance_record)
+
+        # Serialize the new and replaced objects, tracking their offsets
+        out = BytesIO()
+        if not source[file_size - 1:file_size] in (b'\n', b'\r'):
+            out.write(b'\n')
+
+        offsets = {}
+
+        def write_object(num, gen, body):
+            offsets[num] = (file_size + out.tell(), gen)
+            out.write(f"{num} {gen} obj\n".encode())
+            out.write(body)
+            out.write(b"\nendobj\n")
+
+        write_object(pages_ref.idnum, pages_ref.generation, serialize(new_pages))
+        write_object(font_num, 0, serialize(font))
+        write_object(content_num, 0,
+                     f"<< /Length {len(content)} >>\nstream\n".encode() + content + b"\nendstream")
+        write_object(page_num, 0, serialize(page))
+        write_object(info_num, info_ref.generation if info_ref is not None else 0,
+                     serialize(info))
+
+        # Classic xref section with one subsection per object. It opens with
+        # the free-list head (object 0) so readers that expect every section
+        # to be zero-indexed don't try to renumber the entries
+        xref_offset = file_size + out.tell()
+        out.write(b"xref\n0 1\n0000000000 65535 f\r\n")
+        for num in sorted(offsets):
+            offset, gen = offsets[num]
+            out.write(f"{num} 1\n{offset:010d} {gen:05d} n\r\n".encode())
+
+        new_trailer = DictionaryObject({
+            NameObject('/Size'): NumberObject(new_size),
+            NameObject('/Root'): root_ref,
+            NameObject('/Info'): IndirectObject(info_num, 0, reader) if info_ref is None else info_ref,
+            NameObject('/Prev'): NumberObject(prev_xref),
+        })
+        if '/ID' in trailer:
+            new_trailer[NameObject('/ID')] = trailer['/ID']
+
+        out.write(b"trailer\n")
+        out.write(serialize(new_trailer))
+        out.write(f"\nstartxref\n{xref_offset}\n%%EOF\n".encode())
+
+        return out.getvalue()
+
+    def acceptance_metadata(self, acceptance_record):
+        """Document info entries recording the acceptance"""
+
+        metadata = {
+            '/AcceptedAt': acceptance_record.get('timestamp'),
+            '/AcceptedFromIP': acceptance_record.get('ip_address'),
+            '/AcceptedUserAgent': acceptance_record.get('user_agent'),
+            '/AcceptedTimezone': acceptance_record.get('timezone'),
+            '/AcceptanceDocID': acceptance_record.get('doc_id'),
+            '/ModDate': pdf_date(datetime.now(timezone.utc)),
+        }
+        return {NameObject(k): TextStringObject(str(v))
+                for k, v in metadata.items() if v is not None}
+
+    def receipt_content(self, acceptance_record):
+        """Content stream for the receipt page"""
+
+        lines = [
+            ('/F1 16 Tf', self.title),
+            ('/F1 11 Tf', ''),
+            ('/F1 11 Tf', f"Document ID: {acceptance_record.get('doc_id', '')}"),
+            ('/F1 11 Tf', f"Accepted at: {acceptance_record.get('timestamp', '')}"),
+            ('/F1 11 Tf', f"Client timezone: {acceptance_record.get('timezone') or 'unknown'}"),
+            ('/F1 11 Tf', f"IP address: {acceptance_record.get('ip_address') or 'unknown'}"),
+            ('/F1 11 Tf', f"User agent: {acceptance_record.get('user_agent') or 'unknown'}"),
+        ]
+
+        ops = ["BT", "50 742 Td", "18 TL"]
+        for font, text in lines:
+            ops.append(font)
+            ops.append(f"{pdf_string(text)} Tj T*")
+        ops.append("ET")
+        return "\n".join(ops).encode('latin-1')
+
+
+def find_startxref(source):
+    """Offset of the last xref section, read from the tail of the file"""
+
+    tail = source[max(0, len(source) - TAIL_SCAN_BYTES):]
+    matches = list(re.finditer(rb"startxref\s+(\d+)", tail))
+    if not matches:
+        raise ValueError("startxref not found; not a PDF or truncated")
+    return int(matches[-1].group(1))
+
+
+def serialize(obj):
+    buffer = BytesIO()
+    obj.write_to_stream(buffer, None)
+    return buffer.getvalue()
+
+
+def pdf_string(text):
+    """Literal string for a content stream, limited to WinAnsi characters"""
+
+    text = text.encode('cp1252', 'replace').decode('latin-1')
+    escaped = text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+    return f"({escaped})"
+
+
+def pdf_date(moment):
+    return moment.strftime("D:%Y%m%d%H%M%SZ")
+
+
+if __name__ == '__main__':
+    # Stamp the agreement produced by frictionless_pdf_accept.py
+    stamper = AcceptanceStamper()
+    appended = stamper.stamp("agreement.pdf", {
+        'doc_id': 'a1b2c3d4',
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'ip_address': '203.0.113.7',
+        'user_agent': 'Mozilla/5.0',
+        'timezone': 'America/New_York'
+    })
+    print(f"Appended {appended} bytes of acceptance receipt")
@@ -5,14 +5,24 @@ from reportlab.lib.colors import blue
 import uuid
 import hashlib
 from datetime import datetime
+from acceptance_analytics import DEFAULT_TENANT, analytics, register_analytics_routes
 
 class InteractivePDFGenerator:
-    def __init__(self, server_url="https://your-server.com"):
+    def __init__(self, server_url="https://your-server.com", tenants=None):
         self.server_url = server_url
+        # Optional TenantRegistry for multi-business deployments
+        self.tenants = tenants
 
-    def create_pdf_with_accept_button(self, content, output_path):
+    def create_pdf_with_accept_button(self, content, output_path, tenant=None):
         """Create PDF with a unique acceptance link"""
 
+        # Fail before writing anything if the tenant can't be resolved
+        partition = None
+        if tenant is not None:
+            if self.tenants is None:
+                raise ValueError(f"Tenant {tenant!r} given but no TenantRegistry is configured")
+            partition = self.tenants.require(tenant)
+
         # Generate unique document ID
         doc_id = str(uuid.uuid4())
         doc_hash = hashlib.sha256(f"{doc_id}{datetime.now()}".encode()).hexdigest()[:16]
@@ -30,6 +40,9 @@ class InteractivePDFGenerator:
 
         # Add interactive acceptance link
         accept_url = f"{self.server_url}/accept?doc={doc_id}&token={doc_hash}"
+        if tenant is not None:
+            # Signed so the link can't be pointed at another business's data
+            accept_url += f"&tenant={self.tenants.sign(tenant)}"
 
         # Create clickable button area
         c.setFillColor(blue)
@@ -58,6 +71,11 @@ class InteractivePDFGenerator:
 
         c.save()
 
+        if partition is not None:
+            partition.save_document(doc_id, doc_id, client_name=None)
+
+        analytics.record_sent(doc_id, tenant=tenant or DEFAULT_TENANT)
+
         return doc_id, doc_hash
 
     def create_acceptance_server(self):
@@ -75,10 +93,26 @@ class InteractivePDFGenerator:
             client_ip = request.remote_addr
             timestamp = datetime.now()
 
+            partition = None
+            if self.tenants is not None:
+                partition = self.tenants.from_token(request.args.get('tenant'))
+                if partition is None or partition.get_document(doc_id) is None:
+                    return "Invalid or expired link", 403
+
             # Verify token (you'd check against database)
             if self.verify_token(doc_id, token):
                 # Record acceptance in database
-                self.record_acceptance(doc_id, client_ip, timestamp)
+                if partition is not None:
+                    partition.record_acceptance({
+                        'doc_id': doc_id,
+                        'timestamp': timestamp.isoformat(),
+                        'ip_address': client_ip,
+                        'user_agent': request.headers.get('User-Agent')
+                    })
+                else:
+                    self.record_acceptance(doc_id, client_ip, timestamp)
+                analytics.record_accepted(
+                    doc_id, tenant=partition.name if partition is not None else DEFAULT_TENANT)
 
                 # Send notifications
                 self.send_acceptance_notification(doc_id, client_ip, timestamp)
@@ -97,6 +131,8 @@ class InteractivePDFGenerator:
             else:
                 return "Invalid or expired link", 403
 
+        register_analytics_routes(app, tenants=self.tenants)
+
         return app
 
     def send_acceptance_notification(self, doc_id, client_ip, timestamp):
@@ -0,0 +1,345 @@
+import argparse
+import csv
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from acceptance_analytics import DEFAULT_TENANT
+
+# Sentinel telling a stage worker that its input is exhausted
+_DONE = object()
+
+
+def read_quotes(path):
+    """Stream quotes from a .jsonl or .csv file (or '-' for JSONL on stdin).
+
+    Each quote needs an 'id' (used for checkpointing), 'client_name',
+    'client_email' and 'content'.
+    """
+
+    if path == '-':
+        yield from _read_jsonl(sys.stdin, '<stdin>')
+        return
+
+    with open(path, newline='', encoding='utf-8') as f:
+        if path.lower().endswith('.csv'):
+            for line_no, row in enumerate(csv.DictReader(f), start=2):
+                yield _check_quote(row, path, line_no)
+        else:
+            yield from _read_jsonl(f, path)
+
+
+def _read_jsonl(f, source):
+    for line_no, line in enumerate(f, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            quote = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"{source}:{line_no}: invalid JSON: {e}") from None
+        yield _check_quote(quote, source, line_no)
+
+
+def _check_quote(quote, source, line_no):
+    if quote.get('id') in (None, ''):
+        raise ValueError(f"{source}:{line_no}: quote has no 'id'")
+    quote['id'] = str(quote['id'])
+    return quote
+
+
+class Checkpoint:
+    """Append-only log of finished quotes so a campaign can resume.
+
+    Each delivered quote is fsynced to the log before the next one is
+    acknowledged; on restart those quotes are skipped. Failed quotes are
+    logged too but retried on the next run.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.delivered = set()
+        self.lock = threading.Lock()
+
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Torn final line from a crash mid-write
+                        continue
+                    if entry.get('status') == 'delivered':
+                        self.delivered.add(entry['id'])
+
+        self.file = open(path, 'a', encoding='utf-8')
+
+    def is_delivered(self, quote_id):
+        return quote_id in self.delivered
+
+    def mark(self, quote_id, status, **details):
+        entry = {'id': quote_id, 'status': status, 'at': time.time(), **details}
+        with self.lock:
+            self.file.write(json.dumps(entry) + '\n')
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            if status == 'delivered':
+                self.delivered.add(quote_id)
+
+    def close(self):
+        self.file.close()
+
+
+class QuoteCampaign:
+    """Push a stream of quotes through render -> store -> deliver.
+
+    Each stage runs its own pool of worker threads and hands results to the
+    next stage through a bounded queue, so a slow mail server makes the
+    renderers wait instead of piling up PDFs in memory or on disk.
+
+    Stage callables take a quote dict and return it (updated); any
+    exception marks the quote as failed and drops it from the pipeline.
+    """
+
+    def __init__(self, render, deliver, store=None, checkpoint_path="campaign.ckpt",
+                 render_workers=4, store_workers=2, deliver_workers=2, queue_size=64):
+        stages = [('render', render, render_workers)]
+        if store is not None:
+            stages.append(('store', store, store_workers))
+        stages.append(('deliver', deliver, deliver_workers))
+
+        self.stages = stages
+        self.queue_size = queue_size
+        self.checkpoint_path = checkpoint_path
+        self.stats = {}
+        self.stats_lock = threading.Lock()
+
+    def run(self, quotes):
+        """Process quotes (any iterable), returns counts of skipped/delivered/failed"""
+
+        self.stats = {'skipped': 0, 'delivered': 0, 'failed': 0}
+        checkpoint = Checkpoint(self.checkpoint_path)
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        pools = []
+
+        try:
+            for i, (name, func, workers) in enumerate(self.stages):
+                last_stage = i + 1 == len(self.stages)
+                out_queue = None if last_stage else queues[i + 1]
+                next_workers = 0 if last_stage else self.stages[i + 1][2]
+                remaining = [workers]
+                threads = [
+                    threading.Thread(
+                        target=self._worker,
+                        args=(name, func, queues[i], out_queue, remaining, next_workers, checkpoint),
+                        name=f"campaign-{name}-{n}",
+                        daemon=True
+                    )
+                    for n in range(workers)
+                ]
+                for thread in threads:
+                    thread.start()
+                pools.append(threads)
+
+            # Feeding from this thread blocks on a full queue, which is the
+            # backpressure that keeps the reader from running ahead
+            try:
+                for quote in quotes:
+                    if checkpoint.is_delivered(quote['id']):
+                        self._count('skipped')
+                        continue
+                    queues[0].put(quote)
+            finally:
+                # Even when the input is bad, let the quotes already queued
+                # finish and be checkpointed before the error propagates
+                for _ in range(self.stages[0][2]):
+                    queues[0].put(_DONE)
+                for threads in pools:
+                    for thread in threads:
+                        thread.join()
+        finally:
+            checkpoint.close()
+
+        return dict(self.stats)
+
+    def _worker(self, name, func, in_queue, out_queue, remaining, next_workers, checkpoint):
+        try:
+            while True:
+                quote = in_queue.get()
+                if quote is _DONE:
+                    break
+                self._process(name, func, quote, out_queue, checkpoint)
+        finally:
+            # Last worker out closes the next stage's input, even if this
+            # worker died, so downstream stages and run() never hang
+            with self.stats_lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last and out_queue is not None:
+                for _ in range(next_workers):
+                    out_queue.put(_DONE)
+
+    def _process(self, name, func, quote, out_queue, checkpoint):
+        try:
+            quote = func(quote)
+            if out_queue is None:
+                checkpoint.mark(quote['id'], 'delivered', doc_id=quote.get('doc_id'))
+                self._count('delivered')
+        except Exception as e:
+            self._count('failed')
+            try:
+                checkpoint.mark(quote['id'], 'failed', stage=name, error=str(e))
+            except Exception:
+                # Checkpoint unwritable (disk full, EIO); the quote is simply
+                # retried on the next run
+                pass
+            return
+
+        if out_queue is not None:
+            out_queue.put(quote)
+
+    def _count(self, key):
+        with self.stats_lock:
+            self.stats[key] += 1
+
+
+def pdf_renderer(output_dir="campaign_pdfs", base_url="https://your-domain.com", tenants=None,
+                 documents_db="documents.sqlite3"):
+    """Render stage using FrictionlessPDFAcceptance.
+
+    With a TenantRegistry, each quote's optional 'tenant' field selects the
+    business whose partition records the document; quotes without one are
+    recorded in documents_db. Rendering doesn't count
+    the quote as sent; the deliver stage does once delivery succeeds, so a
+    quote that fails and is retried on the next run is only counted once.
+    """
+
+    from frictionless_pdf_accept import FrictionlessPDFAcceptance
+
+    os.makedirs(output_dir, exist_ok=True)
+    system = FrictionlessPDFAcceptance(base_url=base_url, tenants=tenants,
+                                       documents_db=documents_db)
+
+    def render(quote):
+        # CSV rows carry an empty string when the column is blank
+        tenant = quote.get('tenant') or None
+        pdf_path = os.path.join(output_dir, f"{quote['id']}.pdf")
+        doc_id, accept_url = system.create_pdf_with_one_click_accept(
+            content=quote['content'],
+            client_name=quote['client_name'],
+            output_path=pdf_path,
+            tenant=tenant,
+            client_email=quote.get('client_email'),
+            track_send=False
+        )
+        quote.update(pdf_path=pdf_path, doc_id=doc_id, accept_url=accept_url,
+                     short_id=system.short_id_for(doc_id, tenant),
+                     tenant=tenant or DEFAULT_TENANT)
+        return quote
+
+    return render
+
+
+def artifact_storer(root="artifacts"):
+    """Store stage writing each rendered PDF into the ArtifactStore"""
+
+    from artifact_store import ArtifactStore
+
+    store = ArtifactStore(root)
+
+    def store_pdf(quote):
+        record = store.put_file(quote['doc_id'], quote['pdf_path'])
+        quote['sha256'] = record['sha256']
+        return quote
+
+    return store_pdf
+
+
+def email_deliverer():
+    """Deliver stage sending the one-click accept email (counts the send)"""
+
+    from email_button_accept import send_email_with_accept_button
+
+    def deliver(quote):
+        send_email_with_accept_button(quote['client_email'], quote['doc_id'],
+                                      pdf_path=quote['pdf_path'],
+                                      accept_url=quote['accept_url'],
+                                      short_id=quote['short_id'],
+                                      tenant=quote['tenant'])
+        return quote
+
+    return deliver
+
+
+def docusign_deliverer(api_key, account_id, tenants=None):
+    """Deliver stage creating a DocuSign envelope per quote (counts the send)"""
+
+    from docusign_integration import DocumentAcceptanceSystem
+
+    system = DocumentAcceptanceSystem(api_key=api_key, account_id=account_id, tenants=tenants)
+
+    def deliver(quote):
+        quote['envelope_id'] = system.create_document_with_accept_button(
+            quote['pdf_path'], quote['client_email'], tenant=quote['tenant'])
+        return quote
+
+    return deliver
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Send a batch of quotes for acceptance")
+    parser.add_argument('input', help="quotes as .jsonl or .csv, '-' for JSONL on stdin")
+    parser.add_argument('--checkpoint', default='campaign.ckpt')
+    parser.add_argument('--deliver', choices=['email', 'docusign'], default='email')
+    parser.add_argument('--output-dir', default='campaign_pdfs')
+    parser.add_argument('--store', default='artifacts', help="artifact store root, '' to skip")
+    parser.add_argument('--base-url', default='https://your-domain.com')
+    parser.add_argument('--render-workers', type=int, default=4)
+    parser.add_argument('--store-workers', type=int, default=2)
+    parser.add_argument('--deliver-workers', type=int, default=2)
+    parser.add_argument('--queue-size', type=int, default=64)
+    parser.add_argument('--tenant', action='append', default=[], metavar='NAME[:PREFIX]',
+                        help="register a tenant for quotes' 'tenant' field (repeatable)")
+    parser.add_argument('--tenants-dir', default='tenants',
+                        help="tenant partition directory; signing secret from TENANT_SECRET")
+    parser.add_argument('--documents-db', default='documents.sqlite3',
+                        help="database recording quotes without a tenant")
+    args = parser.parse_args(argv)
+
+    tenants = None
+    if args.tenant:
+        from tenant_backend import TenantRegistry
+
+        tenants = TenantRegistry(args.tenants_dir)
+        for spec in args.tenant:
+            name, _, prefix = spec.partition(':')
+            tenants.register(name, prefix or None)
+
+    if args.deliver == 'docusign':
+        deliver = docusign_deliverer(os.environ['DOCUSIGN_API_KEY'],
+                                     os.environ['DOCUSIGN_ACCOUNT_ID'], tenants=tenants)
+    else:
+        deliver = email_deliverer()
+
+    campaign = QuoteCampaign(
+        render=pdf_renderer(args.output_dir, args.base_url, tenants=tenants,
+                            documents_db=args.documents_db),
+        store=artifact_storer(args.store) if args.store else None,
+        deliver=deliver,
+        checkpoint_path=args.checkpoint,
+        render_workers=args.render_workers,
+        store_workers=args.store_workers,
+        deliver_workers=args.deliver_workers,
+        queue_size=args.queue_size
+    )
+    stats = campaign.run(read_quotes(args.input))
+
+    print(f"Delivered {stats['delivered']}, failed {stats['failed']}, "
+          f"skipped {stats['skipped']} already delivered")
+    return 1 if stats['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,22 +1,52 @@
 const http = require('http');
 const fs = require('fs');
 const path = require('path');
+const crypto = require('crypto');
 
 const PORT = process.env.PORT || 3000;
 
+const VIEWER_PATH = path.join(__dirname, 'pdf-viewer.html');
+
+// Viewer HTML is loaded once and kept in memory
+let viewerCache = null;
+
+function loadViewer(callback) {
+    if (viewerCache) {
+        callback(null, viewerCache);
+        return;
+    }
+
+    fs.readFile(VIEWER_PATH, (err, content) => {
+        if (err) {
+            callback(err);
+            return;
+        }
+
+        viewerCache = {
+            content,
+            etag: '"' + crypto.createHash('sha1').update(content).digest('hex') + '"'
+        };
+        callback(null, viewerCache);
+    });
+}
+
 const server = http.createServer((req, res) => {
     // Serve pdf-viewer.html for all routes
-    const filePath = path.join(__dirname, 'pdf-viewer.html');
-
-    fs.readFile(filePath, 'utf8', (err, content) => {
+    loadViewer((err, viewer) => {
         if (err) {
             res.writeHead(500, { 'Content-Type': 'text/plain' });
             res.end('Error loading PDF viewer');
             return;
         }
 
-        res.writeHead(200, { 'Content-Type': 'text/html' });
-        res.end(content);
+        if (req.headers['if-none-match'] === viewer.etag) {
+            res.writeHead(304, { 'ETag': viewer.etag });
+            res.end();
+            return;
+        }
+
+        res.writeHead(200, { 'Content-Type': 'text/html', 'ETag': viewer.etag });
+        res.end(viewer.content);
     });
 });
 
@@ -0,0 +1,262 @@
+import hashlib
+import hmac
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    short_id TEXT PRIMARY KEY,
+    doc_id TEXT NOT NULL,
+    client_name TEXT,
+    client_email TEXT,
+    created_at REAL NOT NULL,
+    pdf_path TEXT
+);
+CREATE TABLE IF NOT EXISTS acceptances (
+    short_id TEXT NOT NULL REFERENCES documents(short_id),
+    timestamp TEXT,
+    ip_address TEXT,
+    user_agent TEXT,
+    timezone TEXT,
+    recorded_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS acceptances_short_id ON acceptances(short_id);
+"""
+
+TENANT_NAME = re.compile(r"^[a-z0-9_]+$")
+
+
+class TenantBusy(Exception):
+    """Raised when a tenant's connection pool stays exhausted past the timeout"""
+
+
+class TenantPartition:
+    """One business's data: its own SQLite file, connection pool and cache.
+
+    Nothing here is shared between tenants, so a campaign writing thousands
+    of documents for one business only ever waits on its own pool and its
+    own database lock; other tenants' lookups are unaffected.
+    """
+
+    def __init__(self, name, prefix, db_path, pool_size=4, cache_size=1024,
+                 acquire_timeout=5.0):
+        self.name = name
+        self.prefix = prefix
+        self.db_path = db_path
+        self.pool_size = pool_size
+        self.acquire_timeout = acquire_timeout
+
+        self.pool = queue.LifoQueue(maxsize=pool_size)
+        self.opened = 0
+        self.pool_lock = threading.Lock()
+
+        self.cache = OrderedDict()
+        self.cache_size = cache_size
+        self.cache_lock = threading.Lock()
+
+        with self.connection() as conn:
+            conn.executescript(SCHEMA)
+            # Partitions created before pdf_path was tracked
+            columns = [row['name'] for row in conn.execute("PRAGMA table_info(documents)")]
+            if 'pdf_path' not in columns:
+                conn.execute("ALTER TABLE documents ADD COLUMN pdf_path TEXT")
+
+    @contextmanager
+    def connection(self):
+        conn = self._acquire()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self.pool.put(conn)
+
+    def save_document(self, short_id, doc_id, client_name, client_email=None, pdf_path=None):
+        with self.connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO documents "
+                "(short_id, doc_id, client_name, client_email, created_at, pdf_path) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (short_id, doc_id, client_name, client_email, time.time(), pdf_path)
+            )
+        self._cache_put(short_id, {
+            'short_id': short_id,
+            'doc_id': doc_id,
+            'client_name': client_name,
+            'client_email': client_email,
+            'pdf_path': pdf_path,
+        })
+
+    def get_document(self, short_id):
+        """Document row for short_id, served from the hot cache when possible"""
+
+        with self.cache_lock:
+            document = self.cache.get(short_id)
+            if document is not None:
+                self.cache.move_to_end(short_id)
+                return document
+
+        with self.connection() as conn:
+            row = conn.execute(
+                "SELECT short_id, doc_id, client_name, client_email, pdf_path "
+                "FROM documents WHERE short_id = ?",
+                (short_id,)
+            ).fetchone()
+        if row is None:
+            return None
+
+        document = dict(row)
+        self._cache_put(short_id, document)
+        return document
+
+    def record_acceptance(self, acceptance_record):
+        """Store the acceptance; False if the document was already accepted"""
+
+        short_id = acceptance_record['doc_id']
+        with self.connection() as conn:
+            # Check and insert in one statement so a double-submitted form
+            # can't record (and stamp) the acceptance twice
+            inserted = conn.execute(
+                "INSERT INTO acceptances SELECT ?, ?, ?, ?, ?, ? "
+                "WHERE NOT EXISTS (SELECT 1 FROM acceptances WHERE short_id = ?)",
+                (short_id,
+                 acceptance_record.get('timestamp'),
+                 acceptance_record.get('ip_address'),
+                 acceptance_record.get('user_agent'),
+                 acceptance_record.get('timezone'),
+                 time.time(),
+                 short_id)
+            ).rowcount
+        return inserted > 0
+
+    def close(self):
+        while True:
+            try:
+                self.pool.get_nowait().close()
+            except queue.Empty:
+                break
+
+    def _acquire(self):
+        try:
+            return self.pool.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self.pool_lock:
+            if self.opened < self.pool_size:
+                self.opened += 1
+                return self._open()
+
+        try:
+            return self.pool.get(timeout=self.acquire_timeout)
+        except queue.Empty:
+            raise TenantBusy(f"No free connection for tenant {self.name}") from None
+
+    def _open(self):
+        conn = sqlite3.connect(self.db_path, timeout=self.acquire_timeout,
+                               check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        # WAL lets readers proceed while a campaign is writing
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _cache_put(self, short_id, document):
+        with self.cache_lock:
+            self.cache[short_id] = document
+            self.cache.move_to_end(short_id)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+
+class TenantRegistry:
+    """Routes requests to tenant partitions.
+
+    A tenant is found either from the prefix of a short id ("acme-1a2b3c4d")
+    or from a signed token ("acme.<hmac>") carried in a link, so one server
+    can host many businesses without trusting client-supplied tenant names.
+    """
+
+    def __init__(self, data_dir="tenants", secret=None, **partition_options):
+        self.data_dir = data_dir
+        self.secret = (secret or os.environ.get('TENANT_SECRET', '')).encode()
+        if not self.secret:
+            raise ValueError("TenantRegistry needs a secret for signing tenant tokens")
+        self.partition_options = partition_options
+        self.by_name = {}
+        self.by_prefix = {}
+        os.makedirs(data_dir, exist_ok=True)
+
+    def register(self, name, prefix=None):
+        """Create (or open) the partition for a business"""
+
+        prefix = prefix or name
+        if not TENANT_NAME.match(name) or not TENANT_NAME.match(prefix):
+            raise ValueError(f"Tenant name and prefix must match {TENANT_NAME.pattern}")
+        if prefix in self.by_prefix and self.by_prefix[prefix].name != name:
+            raise ValueError(f"Prefix {prefix!r} already belongs to {self.by_prefix[prefix].name}")
+        if name in self.by_name:
+            existing = self.by_name[name]
+            if existing.prefix != prefix:
+                raise ValueError(f"Tenant {name!r} is already registered with prefix "
+                                 f"{existing.prefix!r}")
+            return existing
+
+        partition = TenantPartition(name, prefix,
+                                    os.path.join(self.data_dir, f"{name}.sqlite3"),
+                                    **self.partition_options)
+        self.by_name[name] = partition
+        self.by_prefix[prefix] = partition
+        return partition
+
+    def get(self, name):
+        return self.by_name.get(name)
+
+    def require(self, name):
+        """Partition for name, ValueError if the tenant isn't registered"""
+
+        partition = self.by_name.get(name)
+        if partition is None:
+            raise ValueError(f"Unknown tenant {name!r}")
+        return partition
+
+    def short_id(self, name, doc_id):
+        """Tenant-prefixed short id used in acceptance links"""
+
+        return f"{self.by_name[name].prefix}-{doc_id[:8]}"
+
+    def for_short_id(self, short_id):
+        """Partition owning short_id, or None"""
+
+        prefix, sep, _ = short_id.partition('-')
+        if not sep:
+            return None
+        return self.by_prefix.get(prefix)
+
+    def sign(self, name):
+        """Token identifying a tenant that clients cannot forge"""
+
+        return f"{name}.{self._signature(name)}"
+
+    def from_token(self, token):
+        """Partition for a signed token, or None if missing or tampered"""
+
+        name, sep, signature = (token or '').partition('.')
+        if not sep or not hmac.compare_digest(signature, self._signature(name)):
+            return None
+        return self.by_name.get(name)
+
+    def close(self):
+        for partition in self.by_name.values():
+            partition.close()
+
+    def _signature(self, name):
+        return hmac.new(self.secret, name.encode(), hashlib.sha256).hexdigest()[:32]